@@ -1,23 +1,23 @@
 import logging
+from itertools import islice
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-try:
-    from backend.core.database import get_db
-    from backend.models.book import Book
-    from backend.models.page import Page
-    from backend.services.ingest.pdf_service import PDFService
-except ModuleNotFoundError:
-    from core.database import get_db
-    from models.book import Book
-    from models.page import Page
-    from services.ingest.pdf_service import PDFService
+from backend.core.database import get_db
+from backend.models.book import Book
+from backend.models.page import Page, page_text_values
+from backend.services.ingest.pdf_service import MAX_FILE_SIZE_BYTES, MAX_FILE_SIZE_MB, PDFService
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 pdf_service = PDFService()
 
+# Rows per INSERT batch; bounds resident page dicts for very long books.
+PAGE_INSERT_BATCH_SIZE = 1000
+
 def error_payload(code: str, message: str, details: str | None = None) -> dict:
     # Standardized error body for easier frontend handling and debugging.
     return {
@@ -36,6 +36,7 @@ async def health() -> dict:
 
 @router.post("/upload-pdf")
 async def upload_pdf(
+    request: Request,
     file: UploadFile = File(...),
     title: str | None = None,
     author: str | None = None,
@@ -54,10 +55,95 @@ async def upload_pdf(
                 detail=error_payload("INVALID_FILE", "Missing file name in upload."),
             )
 
-        content = await file.read()
-        pdf_path = pdf_service.save_pdf(content, file.filename)
-        pages_data = pdf_service.extract_text_by_page(pdf_path)
-        if not pages_data:
+        # Reject declared-oversized uploads before touching the body at all;
+        # save_pdf still enforces the cap for clients that lie or omit it.
+        content_length = int(request.headers.get("content-length", 0))
+        if content_length > MAX_FILE_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=error_payload(
+                    "FILE_TOO_LARGE",
+                    f"Upload exceeds the {MAX_FILE_SIZE_MB}MB limit.",
+                ),
+            )
+
+        # Skip storage + extraction entirely when the same bytes were
+        # already ingested; the hash lookup is a single indexed SELECT.
+        content_hash = await run_in_threadpool(pdf_service.fingerprint, file.file)
+        existing_book = db.query(Book).filter_by(content_sha256=content_hash).first()
+        if existing_book is not None:
+            existing_path = (
+                db.query(Page.pdf_path).filter_by(book_id=existing_book.id).limit(1).scalar()
+            )
+            return {
+                "book_id": existing_book.id,
+                "title": existing_book.title,
+                "author": existing_book.author,
+                "total_pages": existing_book.total_pages,
+                "pdf_path": existing_path,
+                "message": "PDF already ingested; returning existing book",
+            }
+
+        # End the dedup lookup's implicit read transaction now so the slow
+        # save/extract work below runs outside any DB transaction.
+        db.rollback()
+
+        # save_pdf blocks on disk; run it in the threadpool so the event loop
+        # keeps serving other requests during a large ingest.
+        pdf_path = await run_in_threadpool(pdf_service.save_pdf, file.file, file.filename)
+
+        book_title = title or file.filename.replace(".pdf", "")
+        book_author = author or "Unknown"
+
+        def ingest_pages() -> tuple[int | None, int]:
+            # Extraction yields pages lazily; consume in fixed-size batches so
+            # huge books never hold all their row dicts in memory at once.
+            pages_iter = pdf_service.extract_text_by_page(pdf_path)
+            batch = list(islice(pages_iter, PAGE_INSERT_BATCH_SIZE))
+            if not batch:
+                return None, 0
+
+            # One explicit transaction for the whole ingest: RETURNING gives
+            # us the book id without an interim flush, and the context manager
+            # commits (or rolls back) exactly once.
+            with db.begin():
+                book_id = db.execute(
+                    insert(Book).returning(Book.id),
+                    {
+                        "title": book_title,
+                        "author": book_author,
+                        "total_pages": 0,
+                        "description": f"Uploaded from {file.filename}",
+                        "content_sha256": content_hash,
+                    },
+                ).scalar_one()
+
+                # Batched Core inserts: one multi-VALUES statement per batch
+                # instead of per-row ORM unit-of-work tracking.
+                total_pages = 0
+                while batch:
+                    db.execute(
+                        insert(Page),
+                        [
+                            {
+                                "book_id": book_id,
+                                "page_number": page_data["page_number"],
+                                "pdf_path": pdf_path,
+                                **page_text_values(page_data["text"]),
+                            }
+                            for page_data in batch
+                        ],
+                    )
+                    total_pages += len(batch)
+                    batch = list(islice(pages_iter, PAGE_INSERT_BATCH_SIZE))
+
+                db.execute(
+                    update(Book).where(Book.id == book_id).values(total_pages=total_pages)
+                )
+            return book_id, total_pages
+
+        book_id, total_pages = await run_in_threadpool(ingest_pages)
+        if book_id is None:
             raise HTTPException(
                 status_code=400,
                 detail=error_payload(
@@ -67,31 +153,11 @@ async def upload_pdf(
                 ),
             )
 
-        book = Book(
-            title=title or file.filename.replace(".pdf", ""),
-            author=author or "Unknown",
-            total_pages=len(pages_data),
-            description=f"Uploaded from {file.filename}",
-        )
-        db.add(book)
-        db.flush()
-
-        for page_data in pages_data:
-            db.add(
-                Page(
-                    book_id=book.id,
-                    page_number=page_data["page_number"],
-                    text=page_data["text"],
-                    pdf_path=pdf_path,
-                )
-            )
-
-        db.commit()
         return {
-            "book_id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "total_pages": len(pages_data),
+            "book_id": book_id,
+            "title": book_title,
+            "author": book_author,
+            "total_pages": total_pages,
             # Returning stored path helps later reprocessing/reference workflows.
             "pdf_path": pdf_path,
             "message": "PDF uploaded and pages extracted",
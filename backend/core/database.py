@@ -2,7 +2,7 @@ import os
 from typing import Generator
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 load_dotenv()
@@ -10,23 +10,40 @@ load_dotenv()
 # Use absolute path override via env if needed; fallback keeps local setup simple.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./booktures2.db")
 
+_is_sqlite = "sqlite" in DATABASE_URL
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    # Batch size for SQLAlchemy 2.x "insertmanyvalues" executemany batching.
+    insertmanyvalues_page_size=1000,
+    pool_pre_ping=True,
+    # SQLite ignores pool sizing; give real servers some headroom.
+    **({} if _is_sqlite else {"pool_size": 10, "max_overflow": 20}),
 )
 
+if _is_sqlite:
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        # WAL allows concurrent readers during ingest writes; NORMAL sync
+        # cuts fsyncs per commit (safe with WAL). The rest trims I/O further.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
 def init_db() -> None:
     # Import models here so SQLAlchemy registers metadata before create_all().
-    try:
-        from backend.models.book import Book  # noqa: F401
-        from backend.models.page import Page  # noqa: F401
-    except ModuleNotFoundError:
-        from models.book import Book  # noqa: F401
-        from models.page import Page  # noqa: F401
+    from backend.models.book import Book  # noqa: F401
+    from backend.models.page import Page  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
 
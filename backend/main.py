@@ -1,14 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-try:
-    # Works when running from project root: uvicorn backend.main:app --reload
-    from backend.core.database import init_db
-    from backend.api.routes import router
-except ModuleNotFoundError:
-    # Works when running from backend folder: uvicorn main:app --reload
-    from core.database import init_db
-    from api.routes import router
+# Single supported invocation (from project root): uvicorn backend.main:app
+from backend.core.database import init_db
+from backend.api.routes import router, pdf_service
 
 
 # Main app entrypoint for Phase 1:
@@ -34,3 +29,9 @@ app.include_router(router)
 async def startup_event() -> None:
     # Create DB tables on startup so the project works out-of-the-box.
     init_db()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    # Release the shared extraction worker pool.
+    pdf_service.close()
@@ -1,12 +1,7 @@
-from datetime import datetime
-
-from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy import Column, DateTime, Integer, String, Text, func
 from sqlalchemy.orm import relationship
 
-try:
-    from backend.core.database import Base
-except ModuleNotFoundError:
-    from core.database import Base
+from backend.core.database import Base
 
 
 class Book(Base):
@@ -22,7 +17,10 @@ class Book(Base):
     author = Column(String(255), nullable=False)
     total_pages = Column(Integer, nullable=False, default=0)
     description = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Fingerprint of the source PDF bytes; lets repeat uploads skip re-extraction.
+    content_sha256 = Column(String(64), unique=True, index=True, nullable=True)
+    # DB-side defaults keep timestamps out of the insert payload entirely.
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     pages = relationship("Page", back_populates="book", cascade="all, delete-orphan")